@@ -0,0 +1,126 @@
+"""Version parsing and validation shared by the documentation scripts"""
+
+import functools
+import re
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+# Version patterns have no anchors, they are meant for fullmatch()
+
+# Full version pattern (with optional C++ fix) x.y.z[.t]
+VERSION_RE = re.compile(r'\d+\.\d+\.\d+(?:\.\d+)?')
+# Pattern to extract the C++ fix number
+CPP_FIX_RE = re.compile(r'\d+\.\d+\.\d+\.(\d+)')
+
+# PROJECT(... VERSION x.y.z[.t] ...) in CMakeLists.txt
+CMAKE_PROJECT_VERSION_RE = re.compile(r'PROJECT\s*\([^)]*VERSION\s+(\d+\.\d+\.\d+(?:\.\d+)?)[^)]*\)',
+                                      re.IGNORECASE)
+# PROJECT(... VERSION x.y.z ...) in CMakeLists.txt, Java reference version only
+CMAKE_PROJECT_JAVA_VERSION_RE = re.compile(r'PROJECT\s*\([^)]*VERSION\s+(\d+\.\d+\.\d+)[^)]*\)',
+                                           re.IGNORECASE)
+# SET(VERSION_CPPFIX "t") in CMakeLists.txt
+CMAKE_CPP_FIX_RE = re.compile(r'SET\s*\(VERSION_CPPFIX\s*"(\d+)"\s*\)')
+
+
+class VersionError(Exception):
+    """Custom exception for version-related errors"""
+    pass
+
+
+def validate_version(version: str) -> bool:
+    """
+    Check that version is in format x.y.z[.t]
+
+    Equivalent to VERSION_RE.fullmatch() without going through the regex engine,
+    this is what runs for every tag and every gh-pages directory.
+    """
+    parts = version.split('.')
+    return 3 <= len(parts) <= 4 and all(part.isdecimal() for part in parts)
+
+
+def split_version(version: str) -> Tuple[str, Optional[str]]:
+    """Split version into Java reference version and C++ fix number"""
+    if not validate_version(version):
+        raise VersionError(f"Invalid version format: {version}")
+
+    cpp_fix_match = CPP_FIX_RE.fullmatch(version)
+    if cpp_fix_match:
+        # Split into Java version and C++ fix
+        java_version = version.rsplit('.', 1)[0]
+        cpp_fix = cpp_fix_match.group(1)
+        return java_version, cpp_fix
+    return version, None
+
+
+def search_cmake_project(lines: Iterable[str]) -> Optional[re.Match]:
+    """
+    Search CMakeLists.txt lines for the PROJECT(...) command, stopping at the first match
+
+    A match cannot contain ')' except as its last character, so only the text after the
+    last ')' read so far is kept while looking for it.
+    """
+    buffer = ''
+    for line in lines:
+        if not buffer and 'project' not in line.lower():
+            continue
+        buffer += line
+        if ')' in line:
+            match = CMAKE_PROJECT_VERSION_RE.search(buffer)
+            if match:
+                return match
+            buffer = buffer[buffer.rindex(')') + 1:]
+            if 'project' not in buffer.lower():
+                buffer = ''
+    return None
+
+
+def parse_cmake_version(cmake_file: Path, with_cpp_fix_variable: bool = False) -> str:
+    """
+    Extract version from CMakeLists.txt
+
+    The result is cached per process until the file modification time changes.
+
+    Args:
+        cmake_file: Path to CMakeLists.txt
+        with_cpp_fix_variable: Take the C++ fix from SET(VERSION_CPPFIX "t") instead of
+            the fourth PROJECT VERSION component
+
+    Returns:
+        str: Version string in format X.Y.Z[.T] (Java reference version with optional C++ fix)
+
+    Raises:
+        FileNotFoundError: If CMakeLists.txt doesn't exist
+        VersionError: If version cannot be extracted
+    """
+    if not cmake_file.exists():
+        raise FileNotFoundError(f"CMakeLists.txt not found at {cmake_file}")
+
+    return _parse_cmake_version_cached(str(cmake_file.resolve()), cmake_file.stat().st_mtime_ns,
+                                       with_cpp_fix_variable)
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_cmake_version_cached(cmake_path: str, mtime_ns: int, with_cpp_fix_variable: bool) -> str:
+    """Parse CMakeLists.txt, mtime_ns is only part of the cache key"""
+    cmake_file = Path(cmake_path)
+    if with_cpp_fix_variable:
+        # SET(VERSION_CPPFIX) may appear anywhere, the whole file is needed
+        content = cmake_file.read_text()
+        version_match = CMAKE_PROJECT_JAVA_VERSION_RE.search(content)
+        cpp_fix_match = CMAKE_CPP_FIX_RE.search(content)
+    else:
+        with cmake_file.open(encoding='utf-8') as f:
+            version_match = search_cmake_project(f)
+        cpp_fix_match = None
+
+    if not version_match:
+        raise VersionError("Could not extract PROJECT VERSION")
+
+    version = version_match.group(1)
+    if cpp_fix_match:
+        version = f"{version}.{cpp_fix_match.group(1)}"
+
+    if not VERSION_RE.fullmatch(version):
+        raise VersionError(f"Invalid version format in CMakeLists.txt: {version}")
+
+    return version
@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 
 import argparse
-import re
 import subprocess
 import logging
 from pathlib import Path
-from typing import Optional, Tuple
-from packaging.version import parse, Version
+from typing import FrozenSet, Optional, Tuple
+
+try:
+    from . import _version_utils as version_utils
+except ImportError:
+    import _version_utils as version_utils
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,67 +17,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class VersionError(Exception):
-    """Custom exception for version-related errors"""
-    pass
+VersionError = version_utils.VersionError
 
 class VersionChecker:
     def __init__(self):
-        # Base version (Java reference) pattern x.y.z
-        self.java_version_pattern = re.compile(r'^\d+\.\d+\.\d+$')
-        # Full version pattern (with optional C++ fix) x.y.z[.t]
-        self.version_pattern = re.compile(r'^\d+\.\d+\.\d+(?:\.\d+)?$')
-        # Pattern to extract the C++ fix number
-        self.cpp_fix_pattern = re.compile(r'^\d+\.\d+\.\d+\.(\d+)$')
+        self._tags: Optional[FrozenSet[str]] = None
 
     def validate_version(self, version: str) -> bool:
         """Validate version string format"""
-        return bool(self.version_pattern.match(version))
+        return version_utils.validate_version(version)
 
     def split_version(self, version: str) -> Tuple[str, Optional[str]]:
         """Split version into Java reference version and C++ fix number"""
-        if not self.validate_version(version):
-            raise VersionError(f"Invalid version format: {version}")
-
-        cpp_fix_match = self.cpp_fix_pattern.match(version)
-        if cpp_fix_match:
-            # Split into Java version and C++ fix
-            java_version = version.rsplit('.', 1)[0]
-            cpp_fix = cpp_fix_match.group(1)
-            return java_version, cpp_fix
-        return version, None
+        return version_utils.split_version(version)
 
     def _parse_cmake_version(self, cmake_file: Path) -> str:
-        """
-        Extract base version from CMakeLists.txt
-
-        Args:
-            cmake_file: Path to CMakeLists.txt
-
-        Returns:
-            str: Version string in format X.Y.Z[.T] (Java reference version with optional C++ fix)
-
-        Raises:
-            FileNotFoundError: If CMakeLists.txt doesn't exist
-            VersionError: If version cannot be extracted
-        """
-        if not cmake_file.exists():
-            raise FileNotFoundError(f"CMakeLists.txt not found at {cmake_file}")
-
-        content = cmake_file.read_text()
-
-        # Updated pattern to capture optional fourth number
-        project_version_pattern = r'PROJECT\s*\([^)]*VERSION\s+(\d+\.\d+\.\d+(?:\.\d+)?)[^)]*\)'
-        version_match = re.search(project_version_pattern, content, re.MULTILINE | re.IGNORECASE)
-
-        if not version_match:
-            raise VersionError("Could not extract PROJECT VERSION")
-
-        version = version_match.group(1)
-        if not self.version_pattern.match(version):
-            raise VersionError(f"Invalid version format in CMakeLists.txt: {version}")
-
-        return version
+        """Extract version X.Y.Z[.T] from the PROJECT VERSION of CMakeLists.txt"""
+        return version_utils.parse_cmake_version(cmake_file)
 
     def _run_git_command(self, args: list) -> str:
         """
@@ -83,14 +42,27 @@ class VersionChecker:
         Raises:
             subprocess.CalledProcessError: If command fails
         """
+        # stderr is left to the console: git errors show up in the CI log
         result = subprocess.run(
             ["git"] + args,
-            capture_output=True,
+            stdout=subprocess.PIPE,
             text=True,
             check=True
         )
         return result.stdout.strip()
 
+    def _get_tags(self) -> FrozenSet[str]:
+        """
+        Return the tags of the origin remote, listed once and cached on the instance
+
+        A single ls-remote replaces fetching the tags and then listing them locally.
+        """
+        if self._tags is None:
+            refs = self._run_git_command(["ls-remote", "--tags", "--refs", "origin"])
+            # Lines are "<sha>\trefs/tags/<tag>"
+            self._tags = frozenset(line.rpartition("refs/tags/")[2] for line in refs.splitlines())
+        return self._tags
+
     def check_version(self, tag: Optional[str] = None) -> None:
         """
         Check version consistency between CMakeLists.txt and git tag
@@ -125,12 +97,11 @@ class VersionChecker:
                     )
                 logger.info(f"Version consistency check passed: '{tag}'")
             else:
-                logger.info("Snapshot mode: fetching tags...")
-                self._run_git_command(["fetch", "--tags"])
+                logger.info("Snapshot mode: listing remote tags...")
 
                 # Check if any version with this Java reference exists
-                existing_tags = self._run_git_command(["tag", "-l", f"{cmake_java_version}*"]).split('\n')
-                if existing_tags and any(tag.strip() for tag in existing_tags):
+                existing_tags = self._get_tags()
+                if any(t == cmake_java_version or t.startswith(f"{cmake_java_version}.") for t in existing_tags):
                     if cmake_cpp_fix:
                         # For C++ fixes, check if this specific fix version exists
                         if cmake_version in existing_tags:
@@ -1,67 +1,34 @@
 #!/usr/bin/env python3
 
 import argparse
-import re
 import logging
+import os
+import shutil
+import tempfile
 from pathlib import Path
 from typing import Optional
 
+try:
+    from . import _version_utils as version_utils
+except ImportError:
+    import _version_utils as version_utils
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-class VersionError(Exception):
-    """Custom exception for version-related errors"""
-    pass
+VersionError = version_utils.VersionError
 
 class DoxyfileUpdater:
-    def __init__(self):
-        self.version_pattern = re.compile(r'^\d+\.\d+\.\d+(?:\.\d+)?$')
-
     def validate_version(self, version: str) -> bool:
         """Validate version string format"""
-        return bool(self.version_pattern.match(version))
+        return version_utils.validate_version(version)
 
     def _parse_cmake_version(self, cmake_file: Path) -> str:
-        """
-        Extract version from CMakeLists.txt
-
-        Args:
-            cmake_file: Path to CMakeLists.txt
-
-        Returns:
-            str: Full version string, including C++ fix if present
-
-        Raises:
-            FileNotFoundError: If CMakeLists.txt doesn't exist
-            VersionError: If version cannot be extracted
-        """
-        if not cmake_file.exists():
-            raise FileNotFoundError(f"CMakeLists.txt not found at {cmake_file}")
-
-        content = cmake_file.read_text()
-
-        project_version_pattern = r'PROJECT\s*\([^)]*VERSION\s+(\d+\.\d+\.\d+)[^)]*\)'
-        version_match = re.search(project_version_pattern, content, re.MULTILINE | re.IGNORECASE)
-
-        if not version_match:
-            raise VersionError("Could not extract PROJECT VERSION")
-
-        version = version_match.group(1)
-
-        # Check for C++ fix version
-        cpp_fix_pattern = r'SET\s*\(VERSION_CPPFIX\s*"(\d+)"\s*\)'
-        cpp_fix_match = re.search(cpp_fix_pattern, content)
-
-        if cpp_fix_match:
-            version = f"{version}.{cpp_fix_match.group(1)}"
-
-        if not self.version_pattern.match(version):
-            raise VersionError(f"Invalid version format: {version}")
-
-        return version
+        """Extract version from CMakeLists.txt, including C++ fix if present"""
+        return version_utils.parse_cmake_version(cmake_file, with_cpp_fix_variable=True)
 
     def update_doxyfile(self, doxyfile_path: Path, version: Optional[str] = None) -> None:
         """
@@ -91,8 +58,20 @@ class DoxyfileUpdater:
 
         try:
             content = doxyfile_path.read_text()
-            updated_content = content.replace("%PROJECT_VERSION%", version)
-            doxyfile_path.write_text(updated_content)
+            if "%PROJECT_VERSION%" not in content:
+                logger.warning(f"No %PROJECT_VERSION% placeholder in {doxyfile_path}")
+                return
+            # Write next to the Doxyfile and swap it in, so it is never left half written
+            tmp = tempfile.NamedTemporaryFile("w", dir=doxyfile_path.parent, delete=False)
+            try:
+                with tmp:
+                    tmp.write(content.replace("%PROJECT_VERSION%", version))
+                shutil.copymode(doxyfile_path, tmp.name)
+                os.replace(tmp.name, doxyfile_path)
+            except BaseException:
+                # Covers write errors too (ENOSPC, encoding), no temporary file is left behind
+                os.unlink(tmp.name)
+                raise
             logger.info(f"Updated {doxyfile_path} with version {version}")
         except IOError as e:
             raise IOError(f"Failed to update Doxyfile: {e}")
@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 
 import argparse
+import fcntl
+import functools
 import os
-import re
 import shutil
 import subprocess
+import threading
+import time
 import logging
-import fcntl
 from pathlib import Path
-from packaging.version import parse
+from typing import List, Tuple
+
+try:
+    from . import _version_utils as version_utils
+except ImportError:
+    import _version_utils as version_utils
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,124 +23,230 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_SNAPSHOT_SUFFIX = "-SNAPSHOT"
+_SNAPSHOT_LEN = len(_SNAPSHOT_SUFFIX)
+
+# ioctl request cloning a whole file on copy-on-write filesystems (btrfs, XFS)
+FICLONE = 0x40049409
+
+def _reflink_copy(src, dest):
+    """Copy src to dest as a reflink when the filesystem supports it, else by content"""
+    with open(src, 'rb') as s, open(dest, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            cloned = True
+        except OSError:
+            cloned = False
+    if not cloned:
+        shutil.copyfile(src, dest)
+    shutil.copystat(src, dest)
+    return dest
+
+def _link_or_copy(src, dest):
+    """
+    Hard link src to dest, falling back to a reflink or regular copy
+
+    The Doxygen output and the gh-pages clone normally live on the same filesystem,
+    so linking avoids reading and writing every file. The copy is used when linking
+    is not possible (e.g. across filesystems).
+    """
+    try:
+        os.link(src, dest)
+    except FileExistsError:
+        os.unlink(dest)
+        return _link_or_copy(src, dest)
+    except OSError:
+        return _reflink_copy(src, dest)
+    return dest
+
+def _remove_replaced_links(src: Path, dest: Path) -> None:
+    """
+    Remove the dest entries that copytree(symlinks=True) cannot copy over
+
+    copytree() fails on an existing entry where src has a symlink, and would follow a
+    symlink left in dest where src has a directory. Both are removed beforehand, so
+    publishing again into an existing version directory works like the first time.
+    """
+    for dirpath, dirnames, filenames in os.walk(src):
+        target_dir = os.path.join(dest, os.path.relpath(dirpath, src))
+        for name in dirnames + filenames:
+            target = os.path.join(target_dir, name)
+            if not (os.path.islink(os.path.join(dirpath, name)) or os.path.islink(target)):
+                continue
+            if os.path.islink(target) or not os.path.isdir(target):
+                if os.path.lexists(target):
+                    os.unlink(target)
+            else:
+                shutil.rmtree(target)
+
+def _tar_copy(src: Path, dest: Path) -> None:
+    """Copy the src tree into dest through a tar pipe, without Python work per file"""
+    reader = subprocess.Popen(["tar", "-cf", "-", "-C", str(src), "."], stdout=subprocess.PIPE)
+    writer = subprocess.Popen(["tar", "-xf", "-", "-C", str(dest)], stdin=reader.stdout)
+    # Only the writer holds the pipe now, so the reader gets SIGPIPE if the writer dies
+    reader.stdout.close()
+    if writer.wait() or reader.wait():
+        raise RuntimeError(f"tar copy of {src} to {dest} failed")
+
+def _remove_tree(path: Path) -> None:
+    """Remove a directory tree, logging the entries that cannot be removed"""
+    def log_error(function, failed_path, exc_info):
+        logger.warning(f"Could not remove {failed_path}: {exc_info[1]}")
+    shutil.rmtree(path, onerror=log_error)
+
+@functools.lru_cache(maxsize=512)
+def _version_key(version_str: str) -> tuple:
+    """
+    Create a sortable key for version ordering that maintains the following order:
+    1. SNAPSHOT versions first
+    2. Regular versions in semantic version order (newest first)
+    3. C++ fix versions are treated as an extension of the patch version
+
+    Returns tuple of (is_snapshot, -major, -minor, -patch, -cpp_fix)
+    where negative values are used to sort in descending order
+    """
+    is_snapshot = version_str.endswith(_SNAPSHOT_SUFFIX)
+    clean_version = version_str[:-_SNAPSHOT_LEN] if is_snapshot else version_str
+    if not version_utils.validate_version(clean_version):
+        logger.error(f"Error parsing version {version_str}")
+        # Return a default tuple that will sort to the end
+        return (True, 0, 0, 0, 0)
+
+    major, minor, patch, *cpp_fix = map(int, clean_version.split("."))
+    # Use negative values to sort in descending order
+    # Not is_snapshot comes first to keep snapshots at the top
+    return (not is_snapshot, -major, -minor, -patch, -(cpp_fix[0] if cpp_fix else 0))
+
 class DocumentationManager:
     def __init__(self, github_org: str, repo_name: str):
         self.repo_url = f"https://github.com/{github_org}/{repo_name}.git"
         self.gh_pages_branch = "gh-pages"
-        self.version_pattern = re.compile(r'^\d+\.\d+\.\d+(?:\.\d+)?$')
         self.lock_file = Path("/tmp/doc_manager.lock")
+        self.lock_fd = None
 
     def _acquire_lock(self):
-        """Acquire a file lock to prevent concurrent directory operations"""
-        self.lock_fd = open(self.lock_file, 'w')
+        """
+        Acquire a record lock on the lock file to prevent concurrent directory operations
+
+        The kernel drops the lock when its owner exits, so a lock file left behind is
+        never stale. The owner PID is written to the file for debugging.
+        """
+        # No O_TRUNC: the PID of a running owner must survive a failed attempt
+        self.lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o600)
         try:
-            fcntl.flock(self.lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
-        except BlockingIOError:
+            fcntl.lockf(self.lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (BlockingIOError, PermissionError):
+            os.close(self.lock_fd)
+            self.lock_fd = None
             raise RuntimeError("Another documentation process is running")
+        os.ftruncate(self.lock_fd, 0)
+        os.write(self.lock_fd, str(os.getpid()).encode())
 
     def _release_lock(self):
-        """Release the file lock"""
-        fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
-        self.lock_fd.close()
+        """Release the file lock, if this process holds it"""
+        if self.lock_fd is None:
+            return
+        fcntl.lockf(self.lock_fd, fcntl.LOCK_UN)
+        os.close(self.lock_fd)
+        self.lock_fd = None
 
     def _parse_cmake_version(self, cmake_file: Path) -> str:
         """Extract version from CMakeLists.txt"""
-        if not cmake_file.exists():
-            raise FileNotFoundError(f"CMakeLists.txt not found at {cmake_file}")
-
-        content = cmake_file.read_text()
-        version_match = re.search(r'PROJECT\s*\([^)]*VERSION\s+(\d+\.\d+\.\d+(?:\.\d+)?)[^)]*\)',
-                                  content, re.MULTILINE | re.IGNORECASE)
-
-        if not version_match:
-            raise ValueError("Could not extract PROJECT VERSION")
-        return version_match.group(1)
+        return version_utils.parse_cmake_version(cmake_file)
 
     def _get_version_key(self, version_str: str) -> tuple:
-        """
-        Create a sortable key for version ordering that maintains the following order:
-        1. SNAPSHOT versions first
-        2. Regular versions in semantic version order (newest first)
-        3. C++ fix versions are treated as an extension of the patch version
+        """Create a sortable key for version ordering, see _version_key()"""
+        return _version_key(version_str)
 
-        Returns tuple of (is_snapshot, -major, -minor, -patch, -cpp_fix)
-        where negative values are used to sort in descending order
+    def _safe_copy(self, src: Path, dest: Path, root: Path) -> None:
         """
-        try:
-            is_snapshot = "-SNAPSHOT" in version_str
-            clean_version = version_str.replace("-SNAPSHOT", "")
+        Safely copy a directory tree ensuring no path traversal vulnerability
 
-            # Split version components
-            parts = clean_version.split(".")
+        Symlinks are copied as links, so nothing outside src is read. Across filesystems
+        the tree is streamed through tar when available.
 
-            # Parse components with defaults
-            major = int(parts[0]) if len(parts) > 0 else 0
-            minor = int(parts[1]) if len(parts) > 1 else 0
-            patch = int(parts[2]) if len(parts) > 2 else 0
-            cpp_fix = int(parts[3]) if len(parts) > 3 else 0
-
-            # Use negative values to sort in descending order
-            # Not is_snapshot comes first to keep snapshots at the top
-            return (not is_snapshot, -major, -minor, -patch, -cpp_fix)
-
-        except Exception as e:
-            logger.error(f"Error parsing version {version_str}: {e}")
-            # Return a default tuple that will sort to the end
-            return (True, 0, 0, 0, 0)
-
-    def _safe_copy(self, src: Path, dest: Path) -> None:
-        """Safely copy files ensuring no path traversal vulnerability"""
-        try:
-            src = src.resolve()
-            dest = dest.resolve()
-            if not str(src).startswith(str(src.parent.resolve())):
-                raise ValueError(f"Potential path traversal detected: {src}")
-            if src.is_dir():
-                shutil.copytree(src, dest, dirs_exist_ok=True)
-            else:
-                shutil.copy2(src, dest)
-        except Exception as e:
-            logger.error(f"Error copying {src} to {dest}: {e}")
-            raise
+        Args:
+            src: Directory to copy, must be within root
+            dest: Destination directory
+            root: Resolved directory src must stay within
+        """
+        src = src.resolve(strict=True)
+        if not str(src).startswith(str(root) + os.sep):
+            raise ValueError(f"Potential path traversal detected: {src}")
+        dest.mkdir(parents=True, exist_ok=True)
+        if src.stat().st_dev != dest.stat().st_dev and shutil.which("tar"):
+            # Neither links nor clones work across filesystems, stream the tree instead
+            _tar_copy(src, dest)
+        else:
+            _remove_replaced_links(src, dest)
+            shutil.copytree(src, dest, symlinks=True, copy_function=_link_or_copy, dirs_exist_ok=True)
+
+    def _scan_version_dirs(self, docs_dir: Path) -> Tuple[List[os.DirEntry], List[str]]:
+        """
+        Classify the entries of docs_dir in a single directory read
 
-    def _remove_snapshots(self):
+        Returns tuple of (snapshots, releases): the *-SNAPSHOT entries and the
+        names of the release version directories
+        """
+        logger.info("Looking for version directories")
+        snapshots = []
+        releases = []
+        # DirEntry.is_dir() comes from the directory listing, no stat() per entry
+        with os.scandir(docs_dir) as entries:
+            for d in entries:
+                # Lazy %s formatting: nothing is formatted unless DEBUG is enabled
+                if d.name.endswith(_SNAPSHOT_SUFFIX):
+                    logger.debug("Found SNAPSHOT entry: %s", d.name)
+                    snapshots.append(d)
+                elif d.is_dir(follow_symlinks=False) and version_utils.validate_version(d.name):
+                    logger.debug("Found version directory: %s", d.name)
+                    releases.append(d.name)
+                else:
+                    logger.debug("Skipping non-version entry: %s", d.name)
+        logger.info(f"Found {len(releases)} version directories and {len(snapshots)} SNAPSHOT entries")
+        return snapshots, releases
+
+    def _remove_snapshots(self, snapshots: List[os.DirEntry]):
         """Remove all SNAPSHOT directories"""
         logger.info("Processing SNAPSHOT directories...")
-        for d in Path('.').glob('*-SNAPSHOT'):
-            logger.info(f"Removing SNAPSHOT directory: {d}")
-            if d.is_dir():
-                shutil.rmtree(d)
+        for d in snapshots:
+            logger.info(f"Removing SNAPSHOT directory: {d.name}")
+            if d.is_dir(follow_symlinks=False):
+                shutil.rmtree(d.path)
             else:
-                d.unlink()
+                os.unlink(d.path)
 
-    def _generate_versions_list(self, docs_dir: Path):
-        """Generate the versions list markdown file"""
+    def _generate_versions_list(self, versions: List[str]):
+        """Generate the versions list markdown file from the version directory names"""
         versions_file = Path("list_versions.md")
 
-        logger.info("Looking for version directories")
-        versions = []
-        for d in Path('.').glob('*'):
-            if d.is_dir() and (self.version_pattern.match(d.name) or d.name.endswith("-SNAPSHOT")):
-                logger.info(f"Found version directory: {d.name}")
-                versions.append(d.name)
-            elif d.is_dir():
-                logger.debug(f"Skipping non-version directory: {d.name}")
-
         sorted_versions = sorted(versions, key=self._get_version_key)
-        logger.debug(f"Sorted versions: {sorted_versions}")
+        logger.debug("Sorted versions: %s", sorted_versions)
 
         # Find the latest stable version (first non-SNAPSHOT version)
-        latest_stable = next((v for v in sorted_versions if "-SNAPSHOT" not in v), None)
-
-        with versions_file.open("w") as f:
-            f.write("| Version | Documents |\n")
-            f.write("|:---:|---|\n")
-
-            for version in sorted_versions:
-                # Write latest-stable first if this is the stable version
-                if version == latest_stable:
-                    f.write(f"| latest-stable ({latest_stable}) | [API documentation](latest-stable) |\n")
-                f.write(f"| {version} | [API documentation]({version}) |\n")
+        latest_stable = next((v for v in sorted_versions if not v.endswith(_SNAPSHOT_SUFFIX)), None)
+
+        lines = ["| Version | Documents |\n", "|:---:|---|\n"]
+        for version in sorted_versions:
+            # Write latest-stable first if this is the stable version
+            if version == latest_stable:
+                lines.append(f"| latest-stable ({latest_stable}) | [API documentation](latest-stable) |\n")
+            lines.append(f"| {version} | [API documentation]({version}) |\n")
+
+        versions_file.write_text("".join(lines))
+
+    def _update_latest_stable_link(self, version: str):
+        """Point the latest-stable symlink to version, replacing it atomically"""
+        latest_link = Path("latest-stable")
+        if latest_link.is_dir() and not latest_link.is_symlink():
+            logger.info(f"Removing latest-stable directory: {latest_link}")
+            shutil.rmtree(latest_link)
+
+        # The rename swaps the link in one step, readers never see latest-stable missing
+        tmp_link = Path(f"latest-stable.tmp.{os.getpid()}")
+        tmp_link.unlink(missing_ok=True)
+        tmp_link.symlink_to(version)
+        os.replace(tmp_link, latest_link)
 
     def prepare_documentation(self, version: str = None):
         """
@@ -142,6 +255,7 @@ class DocumentationManager:
         Args:
             version: Version string (tag version for release, or base version for snapshots)
         """
+        cleanup = None
         try:
             self._acquire_lock()
 
@@ -150,7 +264,7 @@ class DocumentationManager:
                 is_snapshot = False
             else:
                 base_version = self._parse_cmake_version(Path("CMakeLists.txt"))
-                version_to_use = f"{base_version}-SNAPSHOT"
+                version_to_use = f"{base_version}{_SNAPSHOT_SUFFIX}"
                 is_snapshot = True
 
             logger.info(f"Using version: {version_to_use}")
@@ -160,16 +274,26 @@ class DocumentationManager:
 
             logger.info(f"Clone {repo_name}...")
             if dest_dir.exists():
-                shutil.rmtree(dest_dir)
-
-            subprocess.run(["git", "clone", "-b", self.gh_pages_branch, self.repo_url, repo_name],
-                           check=True, capture_output=True)
+                # Move the previous checkout aside (atomic) and delete it while cloning.
+                # The path is absolute as the working directory changes below.
+                trash = dest_dir.resolve().with_name(f".trash-{os.getpid()}-{time.time_ns()}")
+                os.rename(dest_dir, trash)
+                cleanup = threading.Thread(target=_remove_tree, args=(trash,))
+                cleanup.start()
+
+            # Only the tip of gh-pages is needed to add the new version
+            subprocess.run(["git", "clone", "--depth=1", "--single-branch", "--no-tags", "-b", self.gh_pages_branch,
+                            self.repo_url, repo_name],
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
 
             os.chdir(dest_dir)
 
+            snapshots, releases = self._scan_version_dirs(Path('.'))
+
             # For releases, remove all SNAPSHOT directories
             if not is_snapshot:
-                self._remove_snapshots()
+                self._remove_snapshots(snapshots)
+                snapshots = []
 
             logger.info(f"Create target directory {version_to_use}...")
             version_dir = Path(version_to_use)
@@ -180,19 +304,15 @@ class DocumentationManager:
             if not doxygen_out.exists():
                 raise FileNotFoundError(f"Doxygen output directory not found at {doxygen_out}")
 
-            for item in doxygen_out.glob("*"):
-                self._safe_copy(item, version_dir / item.name)
+            try:
+                self._safe_copy(doxygen_out, version_dir, Path("..").resolve())
+            except Exception as e:
+                logger.error(f"Error copying {doxygen_out} to {version_dir}: {e}")
+                raise
 
             if not is_snapshot:
                 logger.info("Creating latest-stable symlink...")
-                latest_link = Path("latest-stable")
-                if latest_link.exists():
-                    if latest_link.is_dir():
-                        logger.info(f"Removing latest-stable directory: {latest_link}")
-                        shutil.rmtree(latest_link)
-                    else:
-                        latest_link.unlink()
-                latest_link.symlink_to(version_to_use)
+                self._update_latest_stable_link(version_to_use)
 
                 logger.info("Writing robots.txt...")
                 robots_txt = Path("robots.txt")
@@ -204,11 +324,19 @@ class DocumentationManager:
                 )
 
             logger.info("Generating versions list...")
-            self._generate_versions_list(Path('.'))
+            versions = releases + [d.name for d in snapshots if d.is_dir(follow_symlinks=False)]
+            if version_to_use not in versions:
+                versions.append(version_to_use)
+            self._generate_versions_list(versions)
 
             os.chdir("..")
 
         finally:
+            if cleanup:
+                cleanup.join()
+                # A leftover would leave the old clone (and its .git) in the project working tree
+                if trash.exists():
+                    logger.warning(f"Previous checkout could not be fully removed: {trash}")
             self._release_lock()
 
 if __name__ == "__main__":
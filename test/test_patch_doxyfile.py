@@ -0,0 +1,42 @@
+import os
+import stat
+import tempfile
+import pytest
+from unittest.mock import Mock, patch
+from doxygen.scripts.patch_doxyfile import DoxyfileUpdater
+
+@pytest.fixture
+def updater():
+    return DoxyfileUpdater()
+
+@pytest.fixture
+def doxyfile(tmp_path):
+    doxyfile = tmp_path / "Doxyfile"
+    doxyfile.write_text('PROJECT_NAME = "Test"\nPROJECT_NUMBER = %PROJECT_VERSION%\n')
+    os.chmod(doxyfile, 0o640)
+    return doxyfile
+
+class TestDoxyfileUpdater:
+    def test_update_doxyfile(self, updater, doxyfile):
+        """Test that the placeholder is replaced and the file mode is kept"""
+        updater.update_doxyfile(doxyfile, "1.2.3.1")
+
+        assert doxyfile.read_text() == 'PROJECT_NAME = "Test"\nPROJECT_NUMBER = 1.2.3.1\n'
+        assert stat.S_IMODE(doxyfile.stat().st_mode) == 0o640
+        assert [p.name for p in doxyfile.parent.iterdir()] == ["Doxyfile"]
+
+    def test_update_doxyfile_write_failure(self, updater, doxyfile):
+        """Test that a failed write keeps the Doxyfile and leaves no temporary file"""
+        named_temporary_file = tempfile.NamedTemporaryFile
+
+        def full_disk_file(*args, **kwargs):
+            tmp = named_temporary_file(*args, **kwargs)
+            tmp.write = Mock(side_effect=OSError(28, "No space left on device"))
+            return tmp
+
+        with patch("tempfile.NamedTemporaryFile", side_effect=full_disk_file):
+            with pytest.raises(IOError):
+                updater.update_doxyfile(doxyfile, "1.2.3")
+
+        assert "%PROJECT_VERSION%" in doxyfile.read_text()
+        assert [p.name for p in doxyfile.parent.iterdir()] == ["Doxyfile"]
@@ -0,0 +1,309 @@
+import errno
+import os
+import shutil
+import subprocess
+import sys
+import pytest
+from unittest.mock import patch
+from doxygen.scripts import prepare_documentation
+from doxygen.scripts.prepare_documentation import DocumentationManager, _link_or_copy, _tar_copy
+
+@pytest.fixture
+def manager():
+    return DocumentationManager("test-org", "test-repo")
+
+@pytest.fixture
+def project(manager, tmp_path, monkeypatch):
+    """Project working tree with Doxygen output and a previous gh-pages checkout"""
+    project = tmp_path / "project"
+    (project / ".github" / "doxygen" / "out" / "html").mkdir(parents=True)
+    (project / ".github" / "doxygen" / "out" / "html" / "index.html").write_text("doc")
+    (project / "project" / ".git").mkdir(parents=True)
+    (project / "project" / "old.html").touch()
+    manager.lock_file = tmp_path / "doc_manager.lock"
+    monkeypatch.chdir(project)
+    return project
+
+@pytest.fixture
+def doc_tree(tmp_path):
+    """Doxygen output with a file, a subdirectory and a symlink, inside tmp_path"""
+    src = tmp_path / "html"
+    (src / "search").mkdir(parents=True)
+    (src / "index.html").write_text("index")
+    (src / "search" / "all.js").write_text("search")
+    (src / "main.html").symlink_to("index.html")
+    return src
+
+def assert_doc_tree_copied(dest):
+    assert (dest / "index.html").read_text() == "index"
+    assert (dest / "search" / "all.js").read_text() == "search"
+    assert os.readlink(dest / "main.html") == "index.html"
+
+def move_to_other_device(monkeypatch, dest):
+    """Make dest appear to be on another filesystem than everything else"""
+    real_stat = prepare_documentation.Path.stat
+
+    def other_device_stat(path, *args, **kwargs):
+        st = real_stat(path, *args, **kwargs)
+        if path != dest:
+            return st
+        # Same attributes as the real destination, on another device
+        fields = list(st)
+        fields[2] = st.st_dev + 1
+        return os.stat_result(fields)
+
+    monkeypatch.setattr(prepare_documentation.Path, "stat", other_device_stat)
+
+def fake_clone(args, **kwargs):
+    """Stand-in for git clone creating an empty gh-pages checkout"""
+    os.makedirs(os.path.join(args[-1], ".git"))
+
+class TestDocumentationManager:
+    def test_get_version_key_order(self, manager):
+        """Test version ordering: SNAPSHOT first, then newest release first"""
+        versions = ["1.0.0", "1.10.0", "2.0.0-SNAPSHOT", "1.2.0", "1.2.0.10", "1.2.0.3"]
+
+        assert sorted(versions, key=manager._get_version_key) == [
+            "2.0.0-SNAPSHOT", "1.10.0", "1.2.0.10", "1.2.0.3", "1.2.0", "1.0.0"
+        ]
+
+    def test_get_version_key_invalid(self, manager):
+        """Test that unparsable versions sort after valid ones"""
+        versions = ["invalid-SNAPSHOT", "1.0.0"]
+
+        assert sorted(versions, key=manager._get_version_key) == ["1.0.0", "invalid-SNAPSHOT"]
+
+    def test_scan_version_dirs(self, manager, tmp_path):
+        """Test classification of the gh-pages entries in one pass"""
+        for name in ["1.0.0", "1.1.0.1", "2.0.0-SNAPSHOT", "css"]:
+            (tmp_path / name).mkdir()
+        (tmp_path / "list_versions.md").touch()
+
+        snapshots, releases = manager._scan_version_dirs(tmp_path)
+
+        assert [d.name for d in snapshots] == ["2.0.0-SNAPSHOT"]
+        assert sorted(releases) == ["1.0.0", "1.1.0.1"]
+
+    def test_generate_versions_list(self, manager, tmp_path, monkeypatch):
+        """Test versions list generation from the version directories"""
+        monkeypatch.chdir(tmp_path)
+
+        manager._generate_versions_list(["1.0.0", "1.1.0", "2.0.0-SNAPSHOT"])
+
+        assert (tmp_path / "list_versions.md").read_text() == (
+            "| Version | Documents |\n"
+            "|:---:|---|\n"
+            "| 2.0.0-SNAPSHOT | [API documentation](2.0.0-SNAPSHOT) |\n"
+            "| latest-stable (1.1.0) | [API documentation](latest-stable) |\n"
+            "| 1.1.0 | [API documentation](1.1.0) |\n"
+            "| 1.0.0 | [API documentation](1.0.0) |\n"
+        )
+
+    def test_update_latest_stable_link(self, manager, tmp_path, monkeypatch):
+        """Test that an existing latest-stable symlink is replaced"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "1.0.0").mkdir()
+        (tmp_path / "1.1.0").mkdir()
+        (tmp_path / "latest-stable").symlink_to("1.0.0")
+
+        manager._update_latest_stable_link("1.1.0")
+
+        assert os.readlink(tmp_path / "latest-stable") == "1.1.0"
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["1.0.0", "1.1.0", "latest-stable"]
+
+    def test_update_latest_stable_link_directory(self, manager, tmp_path, monkeypatch):
+        """Test that a latest-stable directory is replaced by a symlink"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "1.1.0").mkdir()
+        (tmp_path / "latest-stable").mkdir()
+        (tmp_path / "latest-stable" / "index.html").touch()
+
+        manager._update_latest_stable_link("1.1.0")
+
+        assert os.readlink(tmp_path / "latest-stable") == "1.1.0"
+
+    def test_safe_copy_rejects_source_outside_root(self, manager, tmp_path):
+        """Test that a source directory outside root is refused"""
+        root = tmp_path / "project"
+        outside = tmp_path / "outside"
+        root.mkdir()
+        outside.mkdir()
+
+        with pytest.raises(ValueError, match="path traversal"):
+            manager._safe_copy(root / ".." / "outside", tmp_path / "dest", root.resolve())
+        assert not (tmp_path / "dest").exists()
+
+    def test_safe_copy_keeps_outside_symlink_as_link(self, manager, tmp_path):
+        """Test that a symlink pointing outside the source is not followed"""
+        root = tmp_path / "project"
+        src = root / "html"
+        src.mkdir(parents=True)
+        secret = tmp_path / "secret.txt"
+        secret.write_text("secret")
+        (src / "leak.txt").symlink_to(secret)
+
+        manager._safe_copy(src, tmp_path / "dest", root.resolve())
+
+        assert (tmp_path / "dest" / "leak.txt").is_symlink()
+        assert os.readlink(tmp_path / "dest" / "leak.txt") == str(secret)
+
+    def test_safe_copy_twice(self, manager, doc_tree, tmp_path):
+        """Test publishing again into an existing version directory"""
+        dest = tmp_path / "dest"
+
+        manager._safe_copy(doc_tree, dest, tmp_path.resolve())
+        manager._safe_copy(doc_tree, dest, tmp_path.resolve())
+
+        assert_doc_tree_copied(dest)
+
+    def test_safe_copy_replaces_changed_links(self, manager, doc_tree, tmp_path):
+        """Test that links and directories swapped between two publishes are replaced"""
+        dest = tmp_path / "dest"
+        manager._safe_copy(doc_tree, dest, tmp_path.resolve())
+        # main.html becomes a file, search a link, and an outside link is left in dest
+        (doc_tree / "main.html").unlink()
+        (doc_tree / "main.html").write_text("main")
+        shutil.rmtree(doc_tree / "search")
+        (doc_tree / "search").symlink_to(".")
+        (doc_tree / "menu").mkdir()
+        (tmp_path / "outside").mkdir()
+        (dest / "menu").symlink_to(tmp_path / "outside")
+        (doc_tree / "menu" / "menu.js").write_text("menu")
+
+        manager._safe_copy(doc_tree, dest, tmp_path.resolve())
+
+        assert (dest / "main.html").read_text() == "main"
+        assert os.readlink(dest / "search") == "."
+        assert not (dest / "menu").is_symlink()
+        assert (dest / "menu" / "menu.js").read_text() == "menu"
+        assert list((tmp_path / "outside").iterdir()) == []
+
+    @pytest.mark.skipif(shutil.which("tar") is None, reason="tar is not installed")
+    def test_safe_copy_twice_across_filesystems(self, manager, doc_tree, tmp_path, monkeypatch):
+        """Test publishing again into an existing version directory through tar"""
+        dest = tmp_path / "dest"
+        move_to_other_device(monkeypatch, dest)
+
+        manager._safe_copy(doc_tree, dest, tmp_path.resolve())
+        manager._safe_copy(doc_tree, dest, tmp_path.resolve())
+
+        assert_doc_tree_copied(dest)
+
+    def test_link_or_copy_replaces_existing_destination(self, tmp_path):
+        """Test that an existing destination is replaced by a hard link"""
+        src = tmp_path / "index.html"
+        dest = tmp_path / "dest.html"
+        src.write_text("new")
+        dest.write_text("old")
+
+        _link_or_copy(src, dest)
+
+        assert dest.read_text() == "new"
+        assert os.path.samefile(src, dest)
+
+    def test_link_or_copy_across_filesystems(self, tmp_path, monkeypatch):
+        """Test the copy fallback when hard linking fails with EXDEV"""
+        src = tmp_path / "index.html"
+        dest = tmp_path / "dest.html"
+        src.write_text("content")
+        os.utime(src, ns=(1_000_000_000, 1_000_000_000))
+
+        def cross_device_link(src, dest):
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+        monkeypatch.setattr(os, "link", cross_device_link)
+
+        _link_or_copy(src, dest)
+
+        assert dest.read_text() == "content"
+        assert not os.path.samefile(src, dest)
+        assert dest.stat().st_mtime_ns == 1_000_000_000
+
+    def test_acquire_lock_held_by_other_process(self, manager, tmp_path):
+        """Test that a second process fails to lock and keeps the owner PID in the file"""
+        manager.lock_file = tmp_path / "doc_manager.lock"
+        manager._acquire_lock()
+        try:
+            # The lock file is read from the other process, a second fd here would drop the lock
+            script = (
+                "from pathlib import Path\n"
+                "from doxygen.scripts.prepare_documentation import DocumentationManager\n"
+                "other = DocumentationManager('test-org', 'test-repo')\n"
+                f"other.lock_file = Path({str(manager.lock_file)!r})\n"
+                "try:\n"
+                "    other._acquire_lock()\n"
+                "except RuntimeError as e:\n"
+                "    print(e)\n"
+                "print(other.lock_file.read_text())\n"
+            )
+            result = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True,
+                                    cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        finally:
+            manager._release_lock()
+
+        assert result.stdout.splitlines() == ["Another documentation process is running", str(os.getpid())]
+        assert manager.lock_fd is None
+
+    def test_release_lock_not_acquired(self, manager, tmp_path):
+        """Test that releasing a lock never acquired does nothing"""
+        manager.lock_file = tmp_path / "doc_manager.lock"
+
+        manager._release_lock()
+
+        assert manager.lock_fd is None
+        assert not manager.lock_file.exists()
+
+    def test_prepare_documentation_removes_previous_checkout(self, manager, project):
+        """Test that the previous checkout is moved aside and removed"""
+        with patch("subprocess.run", side_effect=fake_clone):
+            manager.prepare_documentation("1.0.0")
+
+        assert sorted(p.name for p in project.iterdir()) == [".github", "project"]
+        assert not (project / "project" / "old.html").exists()
+        assert (project / "project" / "1.0.0" / "index.html").read_text() == "doc"
+
+    def test_prepare_documentation_warns_on_leftover_checkout(self, manager, project, monkeypatch, caplog):
+        """Test that a previous checkout which could not be removed is reported"""
+        monkeypatch.setattr(prepare_documentation, "_remove_tree", lambda path: None)
+
+        with patch("subprocess.run", side_effect=fake_clone):
+            manager.prepare_documentation("1.0.0")
+
+        assert any(p.name.startswith(".trash-") for p in project.iterdir())
+        assert "Previous checkout could not be fully removed" in caplog.text
+
+    @pytest.mark.skipif(shutil.which("tar") is None, reason="tar is not installed")
+    def test_tar_copy(self, doc_tree, tmp_path):
+        """Test copying a tree through the tar pipe"""
+        dest = tmp_path / "dest"
+        dest.mkdir()
+
+        _tar_copy(doc_tree, dest)
+
+        assert_doc_tree_copied(dest)
+
+    @pytest.mark.skipif(shutil.which("tar") is None, reason="tar is not installed")
+    def test_tar_copy_missing_source(self, tmp_path):
+        """Test that a failing tar raises RuntimeError"""
+        dest = tmp_path / "dest"
+        dest.mkdir()
+
+        with pytest.raises(RuntimeError, match="tar copy"):
+            _tar_copy(tmp_path / "missing", dest)
+
+    @pytest.mark.parametrize("tar_path, uses_tar", [("/usr/bin/tar", True), (None, False)])
+    def test_safe_copy_across_filesystems(self, manager, doc_tree, tmp_path, monkeypatch, tar_path, uses_tar):
+        """Test that tar is used across filesystems when available, copytree otherwise"""
+        dest = tmp_path / "dest"
+        tar_calls = []
+        def tar_copy(src, dest):
+            tar_calls.append((src, dest))
+            shutil.copytree(src, dest, symlinks=True, dirs_exist_ok=True)
+
+        move_to_other_device(monkeypatch, dest)
+        monkeypatch.setattr(prepare_documentation, "_tar_copy", tar_copy)
+        monkeypatch.setattr(shutil, "which", lambda name: tar_path)
+
+        manager._safe_copy(doc_tree, dest, tmp_path.resolve())
+
+        assert tar_calls == ([(doc_tree.resolve(), dest)] if uses_tar else [])
+        assert_doc_tree_copied(dest)
@@ -1,8 +1,15 @@
+import os
 import pytest
 from unittest.mock import Mock, patch, mock_open
 from pathlib import Path
 import subprocess
 from doxygen.scripts.check_version import VersionChecker, VersionError
+from doxygen.scripts import _version_utils
+
+@pytest.fixture(autouse=True)
+def clear_cmake_cache():
+    # Mocked CMakeLists.txt files share the same path and modification time
+    _version_utils._parse_cmake_version_cached.cache_clear()
 
 @pytest.fixture
 def checker():
@@ -35,13 +42,14 @@ class TestVersionChecker:
         assert not checker.validate_version("")
 
     @patch('pathlib.Path.exists')
-    @patch('pathlib.Path.read_text')
-    def test_parse_cmake_version(self, mock_read_text, mock_exists, checker, mock_cmake_content):
+    @patch('pathlib.Path.stat')
+    def test_parse_cmake_version(self, mock_stat, mock_exists, checker, mock_cmake_content):
         """Test CMake version parsing"""
         mock_exists.return_value = True
-        mock_read_text.return_value = mock_cmake_content
+        mock_stat.return_value = Mock(st_mtime_ns=1)
         
-        version = checker._parse_cmake_version(Path("CMakeLists.txt"))
+        with patch('pathlib.Path.open', mock_open(read_data=mock_cmake_content)):
+            version = checker._parse_cmake_version(Path("CMakeLists.txt"))
         assert version == "1.2.3-rc1"
 
     @patch('pathlib.Path.exists')
@@ -53,11 +61,12 @@ class TestVersionChecker:
             checker._parse_cmake_version(Path("CMakeLists.txt"))
 
     @patch('pathlib.Path.exists')
-    @patch('pathlib.Path.read_text')
-    def test_parse_cmake_version_invalid_content(self, mock_read_text, mock_exists, checker):
+    @patch('pathlib.Path.stat')
+    @patch('pathlib.Path.open', new_callable=mock_open, read_data="Invalid CMake content")
+    def test_parse_cmake_version_invalid_content(self, mock_file, mock_stat, mock_exists, checker):
         """Test error handling for invalid CMake content"""
         mock_exists.return_value = True
-        mock_read_text.return_value = "Invalid CMake content"
+        mock_stat.return_value = Mock(st_mtime_ns=1)
         
         with pytest.raises(VersionError):
             checker._parse_cmake_version(Path("CMakeLists.txt"))
@@ -105,3 +114,60 @@ class TestVersionChecker:
         
         with pytest.raises(SystemExit):
             checker.check_version(None)
+
+    @patch.object(VersionChecker, '_parse_cmake_version')
+    @patch.object(VersionChecker, '_run_git_command')
+    def test_check_version_similar_tag_prefix(self, mock_git, mock_parse, checker):
+        """Test that tags only sharing a prefix do not count as released"""
+        mock_parse.return_value = "1.2.3"
+        mock_git.return_value = ("0123456789abcdef0123456789abcdef01234567\trefs/tags/1.2.30\n"
+                                 "89abcdef0123456789abcdef0123456789abcdef\trefs/tags/1.2.31.1")
+
+        checker.check_version(None)
+        # Should not raise any exception
+
+    @patch.object(VersionChecker, '_parse_cmake_version')
+    @patch.object(VersionChecker, '_run_git_command')
+    def test_check_version_existing_cpp_fix(self, mock_git, mock_parse, checker):
+        """Test version checking with an already released C++ fix"""
+        mock_parse.return_value = "1.2.3.1"
+        mock_git.return_value = "0123456789abcdef0123456789abcdef01234567\trefs/tags/1.2.3.1"
+
+        with pytest.raises(SystemExit):
+            checker.check_version(None)
+        mock_git.assert_called_once_with(["ls-remote", "--tags", "--refs", "origin"])
+
+    def test_parse_cmake_version_cache(self, checker, tmp_path):
+        """Test that CMakeLists.txt is parsed again once modified"""
+        cmake_file = tmp_path / "CMakeLists.txt"
+        cmake_file.write_text("PROJECT(TestProject VERSION 1.2.3)")
+        assert checker._parse_cmake_version(cmake_file) == "1.2.3"
+
+        cmake_file.write_text("PROJECT(TestProject VERSION 1.2.4)")
+        stat = cmake_file.stat()
+        os.utime(cmake_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        assert checker._parse_cmake_version(cmake_file) == "1.2.4"
+
+    def test_parse_cmake_version_multiline_project(self, checker, tmp_path):
+        """Test PROJECT() spanning several lines, as recommended in the documentation"""
+        cmake_file = tmp_path / "CMakeLists.txt"
+        cmake_file.write_text(
+            "CMAKE_MINIMUM_REQUIRED(VERSION 3.5)\n"
+            "\n"
+            "PROJECT(KeypopExample\n"
+            "        VERSION 2.1.1\n"
+            "        C CXX)\n"
+        )
+
+        assert checker._parse_cmake_version(cmake_file) == "2.1.1"
+
+    def test_parse_cmake_version_parenthesis_before_project(self, checker, tmp_path):
+        """Test a ')' closing another command earlier on the PROJECT line"""
+        cmake_file = tmp_path / "CMakeLists.txt"
+        cmake_file.write_text(
+            "SET(CMAKE_CXX_STANDARD 17) PROJECT(KeypopExample\n"
+            "        VERSION 2.1.1.3\n"
+            "        C CXX)\n"
+        )
+
+        assert checker._parse_cmake_version(cmake_file) == "2.1.1.3"